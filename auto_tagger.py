@@ -2,8 +2,15 @@ import os
 import time
 import re
 import sys
+import math
+import random
+import shutil
+import argparse
+import tempfile
 from pathlib import Path
 
+from migrate import AUTO_TAGS, NO_NAMESPACE_SHARD, is_index_file, title_namespace
+
 # --- INTENTO DE IMPORTACIÓN ---
 try:
     import ollama
@@ -13,6 +20,7 @@ except ImportError:
 
 try:
     import google.generativeai as genai
+    from google.api_core import exceptions as google_exceptions
     HAS_GEMINI = True
 except ImportError:
     HAS_GEMINI = False
@@ -23,6 +31,39 @@ TEST_LIMIT = 0
 OLLAMA_MODEL = "llama3.1"
 GEMINI_MODEL = "gemini-2.0-flash"
 
+# Reintentos ante límite de peticiones (429)
+MAX_RETRIES = 3
+RETRY_BACKOFF = 2.0  # segundos; se duplica en cada reintento
+
+# Planificación: criterios en orden de prioridad (untagged, recent, short, namespace)
+PRIORITY_ORDER = ["untagged", "recent", "short"]
+PRIORITY_NAMESPACES = []  # ej: ["Trabajo", "Proyectos"]
+
+# Presupuestos por ejecución (0 = sin límite)
+MAX_MINUTES = 0
+MAX_TOKENS = 0
+MAX_COST = 0.0
+# USD por millón de tokens (entrada, salida); los tokens se estiman con CHARS_PER_TOKEN
+PRICE_PER_MTOKEN = {"gemini": (0.10, 0.40), "ollama": (0.0, 0.0), "fake": (0.0, 0.0)}
+CHARS_PER_TOKEN = 4
+EXPECTED_OUTPUT_TOKENS = 60
+
+# Pausa tras cada nota correcta, por proveedor (cuota de la API)
+PROVIDER_DELAY = {"gemini": 3}
+
+# Proveedor simulado para benchmarks y pruebas sin red
+FAKE_CONFIG = {
+    "latency_dist": "lognormal",  # constant | uniform | exponential | lognormal
+    "latency_ms": 800,
+    "error_rate": 0.02,
+    "rate_limit_rate": 0.05,
+    "messy_rate": 0.3,
+}
+FAKE_RNG = random.Random()
+
+FRONTMATTER_PATTERN = re.compile(r"^---\n(.*?)\n---\n", re.DOTALL)
+FAKE_TAGS = ["Trabajo", "Proyecto X", "Reunión", "Ideas", "Lectura", "Finanzas", "Viajes", "Salud"]
+
 def load_api_key(filename="api_key.txt"):
     try:
         key_path = Path(__file__).parent / filename
@@ -57,6 +98,8 @@ def get_prompt(text_content):
     """
 
 # --- MOTORES ---
+# Cada motor recibe el texto de la nota y devuelve la respuesta cruda, None si
+# hubo error, "MISSING_LIB" si falta la librería o "RATE_LIMITED" ante un 429.
 def generate_with_ollama(text):
     if not HAS_OLLAMA: return "MISSING_LIB"
     try:
@@ -65,6 +108,7 @@ def generate_with_ollama(text):
         ])
         return response['message']['content']
     except Exception as e:
+        if getattr(e, 'status_code', None) == 429: return "RATE_LIMITED"
         print(f"   ⚠️ Error Ollama: {e}")
         return None
 
@@ -75,9 +119,71 @@ def generate_with_gemini(text):
         response = model.generate_content(get_prompt(text))
         return response.text
     except Exception as e:
+        if isinstance(e, google_exceptions.ResourceExhausted) or getattr(e, 'code', None) == 429: return "RATE_LIMITED"
         print(f"   ⚠️ Error Gemini: {e}")
         return None
 
+def fake_latency():
+    mean = FAKE_CONFIG["latency_ms"] / 1000
+    dist = FAKE_CONFIG["latency_dist"]
+    if dist == "constant": return mean
+    if dist == "uniform": return FAKE_RNG.uniform(0, 2 * mean)
+    if dist == "exponential": return FAKE_RNG.expovariate(1 / mean) if mean > 0 else 0
+    # lognormal con la media pedida y cola larga (sigma=0.8)
+    sigma = 0.8
+    return FAKE_RNG.lognormvariate(math.log(mean) - sigma ** 2 / 2, sigma) if mean > 0 else 0
+
+def generate_with_fake(text):
+    """Simula un LLM: latencia aleatoria, errores, 429 y respuestas mal formateadas."""
+    time.sleep(fake_latency())
+    roll = FAKE_RNG.random()
+    if roll < FAKE_CONFIG["error_rate"]: return None
+    if roll < FAKE_CONFIG["error_rate"] + FAKE_CONFIG["rate_limit_rate"]: return "RATE_LIMITED"
+
+    tags = ", ".join(f"[[{t}]]" for t in FAKE_RNG.sample(FAKE_TAGS, FAKE_RNG.randint(2, 4)))
+    summary = "Nota de prueba generada por el proveedor simulado."
+    if FAKE_RNG.random() >= FAKE_CONFIG["messy_rate"]:
+        return f"TAGS: {tags}\nSUMMARY: {summary}"
+    return FAKE_RNG.choice([
+        f"**TAGS**: {tags}\n**SUMMARY**: {summary}",
+        f"Claro, aquí tienes el análisis:\n\nEtiquetas: {tags}\nResumen: {summary}",
+        f"```\nTAGS: {tags}\nSUMMARY: {summary}\n```",
+        f"tags : {tags.replace('[[', '').replace(']]', '')}\nsummary : {summary}",
+        f"TAGS: {tags}",  # sin resumen -> BAD_RESPONSE
+        "Lo siento, no puedo analizar esta nota.",
+    ])
+
+PROVIDERS = {
+    "ollama": generate_with_ollama,
+    "gemini": generate_with_gemini,
+    "fake": generate_with_fake,
+}
+
+def generate(provider, text, metrics=None):
+    """Llama al motor con reintentos (backoff exponencial) ante 429."""
+    engine = PROVIDERS[provider]
+    for attempt in range(MAX_RETRIES + 1):
+        start = time.perf_counter()
+        response = engine(text)
+        if metrics is not None:
+            metrics["latencies"].append(time.perf_counter() - start)
+            if response and response not in ("MISSING_LIB", "RATE_LIMITED"):
+                metrics["tokens_in"] += estimate_tokens(get_prompt(text))
+                metrics["tokens_out"] += estimate_tokens(response)
+        if response != "RATE_LIMITED" or attempt == MAX_RETRIES:
+            return response
+        if metrics is not None:
+            metrics["retries"] += 1
+        time.sleep(RETRY_BACKOFF * 2 ** attempt)
+    return response
+
+def estimate_tokens(text):
+    return len(text) // CHARS_PER_TOKEN + 1
+
+def estimate_cost(provider, tokens_in, tokens_out):
+    price_in, price_out = PRICE_PER_MTOKEN.get(provider, (0.0, 0.0))
+    return (tokens_in * price_in + tokens_out * price_out) / 1_000_000
+
 # --- PARSEO ROBUSTO (REGEX) ---
 def parse_ai_response(response_text):
     """
@@ -105,32 +211,32 @@ def parse_ai_response(response_text):
 
     return tags, summary
 
-def update_note(file_path, provider):
+def update_note(file_path, provider, metrics=None):
     with open(file_path, 'r', encoding='utf-8') as f:
         content = f.read()
 
     if "ai-summary:" in content: return "SKIPPED"
 
-    yaml_pattern = r"^---\n(.*?)\n---\n"
-    match = re.search(yaml_pattern, content, re.DOTALL)
+    match = FRONTMATTER_PATTERN.search(content)
     if not match: return "NO_FRONTMATTER"
 
     original_block = match.group(1)
     
     # GENERAR
-    if provider == "ollama":
-        ai_response = generate_with_ollama(content)
-    else:
-        ai_response = generate_with_gemini(content)
+    ai_response = generate(provider, content, metrics)
 
-    if ai_response == "MISSING_LIB": return "MISSING_LIB"
+    if ai_response in ("MISSING_LIB", "RATE_LIMITED"): return ai_response
     if not ai_response: return "API_ERROR"
 
     # PARSEAR
     new_tags, new_summary = parse_ai_response(ai_response)
+    if metrics is not None:
+        metrics["parsed"] += 1
 
     # CHECK DE FALLO
     if not new_summary:
+        if metrics is not None:
+            metrics["parse_failures"] += 1
         # DEBUG: Si falla, descomenta la siguiente línea para ver qué dijo la IA
         # print(f"\n[DEBUG FAIL] Respuesta IA:\n{ai_response}\n")
         return "BAD_RESPONSE"
@@ -187,59 +293,260 @@ def draw_progress_bar(current, total, bar_length=20):
     spaces = '░' * (bar_length - len(arrow))
     return f"[{arrow}{spaces}] {int(percent)}%"
 
-def main():
-    print("🤖 AUTO TAGGER V3.1 (Robust Parser)")
-    print("-----------------------------------")
-    print("1. Ollama (Local)")
-    print("2. Gemini (Cloud)")
-    choice = input("\nOpción [1/2]: ").strip()
-    
-    provider = "ollama"
-    if choice == "2":
-        provider = "gemini"
+def setup_provider(provider):
+    if provider == "gemini":
         if not HAS_GEMINI:
             print("❌ Falta librería google-generativeai.")
-            return
+            return False
         genai.configure(api_key=load_api_key())
-    else:
+    elif provider == "ollama":
         if not HAS_OLLAMA:
             print("❌ Falta librería ollama.")
-            return
+            return False
+    return True
 
-    path = Path(PAGES_DIR)
-    if not path.exists():
-        print(f"❌ No existe {PAGES_DIR}")
-        return
+def new_metrics():
+    return {"latencies": [], "retries": 0, "parsed": 0, "parse_failures": 0, "tokens_in": 0, "tokens_out": 0}
 
-    all_files = [f for f in path.iterdir() if f.is_file() and f.suffix == '.md']
-    total_files = len(all_files)
-    limit = TEST_LIMIT if TEST_LIMIT > 0 else total_files
-    files_to_process = all_files[:limit]
-    
-    print(f"\n📂 Procesando {len(files_to_process)} notas...")
-    print("-" * 60)
-    
-    stats = {"ok":0, "skip":0, "err":0}
+# --- PLANIFICACIÓN ---
+def scan_note(file_path):
+    """
+    Decide si update_note podría procesar la nota (mismas comprobaciones) y
+    extrae del frontmatter los datos de prioridad.
+    """
+    with open(file_path, 'r', encoding='utf-8') as f:
+        content = f.read()
+    info = {'path': file_path, 'done': "ai-summary:" in content, 'schedulable': False, 'tagged': False,
+            'updated-at': 0, 'size': len(content), 'namespace': NO_NAMESPACE_SHARD}
+
+    match = FRONTMATTER_PATTERN.search(content)
+    if match:
+        info['schedulable'] = not info['done']
+        for line in match.group(1).split('\n'):
+            if ":" not in line: continue
+            key, val = line.split(":", 1)
+            key = key.strip().lower()
+            val = val.strip()
+            if key == "title":
+                info['namespace'] = title_namespace(val)
+            elif key == "tags":
+                tags = {t.strip() for t in val.split(',') if t.strip()}
+                info['tagged'] = bool(tags - set(AUTO_TAGS))
+            elif key in ("updated-at", "created-at") and not (key == "created-at" and info['updated-at']):
+                try: info['updated-at'] = int(val)
+                except ValueError: pass
+    if not info['updated-at']:
+        info['updated-at'] = int(file_path.stat().st_mtime * 1000)
+    return info
+
+def schedule_notes(files, priority=None, namespaces=None):
+    """
+    Descarta las notas ya resumidas o sin frontmatter (y las páginas de índice) y ordena el resto según los criterios de
+    'priority', aplicados en orden (el primero manda, los siguientes desempatan).
+    """
+    priority = list(priority or PRIORITY_ORDER)
+    namespaces = list(namespaces or PRIORITY_NAMESPACES)
+    if namespaces and "namespace" not in priority:
+        priority.insert(0, "namespace")
+
+    def sort_key(note):
+        key = []
+        for criterion in priority:
+            if criterion == "untagged": key.append(note['tagged'])
+            elif criterion == "recent": key.append(-note['updated-at'])
+            elif criterion == "short": key.append(note['size'])
+            elif criterion == "namespace":
+                key.append(namespaces.index(note['namespace']) if note['namespace'] in namespaces else len(namespaces))
+        key.append(note['path'].name)
+        return key
 
-    for i, file in enumerate(files_to_process, 1):
-        bar = draw_progress_bar(i, len(files_to_process))
-        print(f"\n{bar} | {i}/{len(files_to_process)} | {file.name}")
+    pending = [n for n in (scan_note(f) for f in files if not is_index_file(f.name)) if n['schedulable']]
+    pending.sort(key=sort_key)
+    return [n['path'] for n in pending]
 
-        status = update_note(file, provider)
+def budget_exhausted(budget, provider, metrics, elapsed, done, next_file):
+    """Devuelve el motivo si empezar la siguiente nota rebasaría algún presupuesto."""
+    if not budget: return None
+    if budget.get("minutes"):
+        avg = elapsed / done if done else 0
+        if elapsed + avg > budget["minutes"] * 60: return "tiempo"
+    next_in = estimate_tokens(get_prompt("x" * min(next_file.stat().st_size, 6000)))
+    tokens_in = metrics["tokens_in"] + next_in
+    tokens_out = metrics["tokens_out"] + EXPECTED_OUTPUT_TOKENS
+    if budget.get("tokens") and tokens_in + tokens_out > budget["tokens"]: return "tokens"
+    if budget.get("cost") and estimate_cost(provider, tokens_in, tokens_out) > budget["cost"]: return "coste"
+    return None
+
+def run_tagging(files, provider, metrics=None, verbose=True, budget=None):
+    stats = {"ok":0, "skip":0, "err":0, "pending":0}
+    if metrics is None: metrics = new_metrics()
+    start = time.monotonic()
+
+    for i, file in enumerate(files, 1):
+        reason = budget_exhausted(budget, provider, metrics, time.monotonic() - start, i - 1, file)
+        if reason:
+            stats["pending"] = len(files) - i + 1
+            print(f"\n⏹️  Presupuesto de {reason} agotado: quedan {stats['pending']} notas para la próxima ejecución")
+            break
+
+        if verbose:
+            bar = draw_progress_bar(i, len(files))
+            print(f"\n{bar} | {i}/{len(files)} | {file.name}")
+
+        status = update_note(file, provider, metrics)
         
         if status == "SUCCESS":
-            print(f"   ✅ Listo")
+            if verbose: print(f"   ✅ Listo")
             stats["ok"] += 1
-            if provider == "gemini": time.sleep(3)
+            time.sleep(PROVIDER_DELAY.get(provider, 0))
         elif status == "SKIPPED":
-            print(f"   ⏩ Saltado")
+            if verbose: print(f"   ⏩ Saltado")
             stats["skip"] += 1
         else:
-            print(f"   ❌ Fallo: {status}")
+            if verbose: print(f"   ❌ Fallo: {status}")
             stats["err"] += 1
 
+    return stats
+
+# --- BENCHMARK ---
+def generate_synthetic_notes(path, count):
+    """Crea notas con el formato que deja migrate.py y longitudes variadas."""
+    path.mkdir(parents=True, exist_ok=True)
+    rng = random.Random(count)
+    words = "proyecto reunión idea lectura viaje plan tarea código cliente informe revisión nota".split()
+    for i in range(count):
+        body = " ".join(rng.choice(words) for _ in range(rng.randint(20, 2000)))
+        content = (f"---\ntitle: Bench/Nota {i}\ntags: [[Joplin]], [[Por Procesar]]\n"
+                   f"created-at: {1600000000000 + i}\nupdated-at: {1600000000000 + i}\n---\n{body}\n")
+        with open(path / f"Bench.Nota {i}.md", 'w', encoding='utf-8') as f:
+            f.write(content)
+
+def percentile(values, pct):
+    if not values: return 0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+def run_benchmark(provider, source_dir, count, limit=0, priority=None, namespaces=None, budget=None):
+    """Ejecuta un tagging completo sobre una copia temporal y mide rendimiento."""
+    with tempfile.TemporaryDirectory() as tmp:
+        work_dir = Path(tmp) / "pages"
+        if source_dir.exists():
+            shutil.copytree(source_dir, work_dir)
+            print(f"📋 Benchmark sobre copia de {source_dir}")
+        else:
+            generate_synthetic_notes(work_dir, count)
+            print(f"🧪 Benchmark sobre {count} notas sintéticas")
+
+        files = [f for f in work_dir.iterdir() if f.is_file() and f.suffix == '.md']
+        files = schedule_notes(files, priority, namespaces)
+        if limit > 0: files = files[:limit]
+
+        metrics = new_metrics()
+        start = time.perf_counter()
+        stats = run_tagging(files, provider, metrics, verbose=False, budget=budget)
+        elapsed = time.perf_counter() - start
+
+    processed = stats["ok"] + stats["err"]
+    latencies_ms = [l * 1000 for l in metrics["latencies"]]
+    parse_rate = metrics["parse_failures"] / metrics["parsed"] * 100 if metrics["parsed"] else 0
+
+    print("\n" + "=" * 60)
+    print(f"📊 BENCHMARK ({provider})")
+    print("=" * 60)
+    print(f"Notas procesadas: {processed} de {len(files)} (✅{stats['ok']}  ⏩{stats['skip']}  ❌{stats['err']}  "
+          f"⏳{stats['pending']} pendientes por presupuesto) en {elapsed:.2f}s")
+    print(f"Throughput: {processed / elapsed if elapsed else 0:.2f} notas/s")
+    print(f"Latencia por llamada (ms): p50 {percentile(latencies_ms, 50):.0f} | "
+          f"p95 {percentile(latencies_ms, 95):.0f} | p99 {percentile(latencies_ms, 99):.0f} "
+          f"({len(latencies_ms)} llamadas)")
+    print(f"Reintentos (429): {metrics['retries']}")
+    print(f"Tokens estimados: {metrics['tokens_in']} entrada / {metrics['tokens_out']} salida "
+          f"(${estimate_cost(provider, metrics['tokens_in'], metrics['tokens_out']):.4f})")
+    print(f"Fallos de parse_ai_response: {metrics['parse_failures']}/{metrics['parsed']} ({parse_rate:.1f}%)")
+    return stats, metrics
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Etiqueta y resume notas de Logseq con IA.")
+    parser.add_argument("--provider", choices=sorted(PROVIDERS), help="Motor a usar (sin esta opción se muestra el menú)")
+    parser.add_argument("--pages-dir", default=PAGES_DIR)
+    parser.add_argument("--limit", type=int, default=TEST_LIMIT, help="Máximo de notas a procesar (0 = todas)")
+    parser.add_argument("--priority", default=",".join(PRIORITY_ORDER),
+                        help="Criterios de orden separados por comas: untagged, recent, short, namespace")
+    parser.add_argument("--namespaces", default=",".join(PRIORITY_NAMESPACES),
+                        help="Namespaces (Carpeta) a procesar primero, separados por comas")
+    parser.add_argument("--max-minutes", type=float, default=MAX_MINUTES, help="Presupuesto de tiempo (0 = sin límite)")
+    parser.add_argument("--max-tokens", type=int, default=MAX_TOKENS, help="Presupuesto de tokens estimados (0 = sin límite)")
+    parser.add_argument("--max-cost", type=float, default=MAX_COST, help="Presupuesto en USD (0 = sin límite)")
+    parser.add_argument("--max-retries", type=int, default=MAX_RETRIES)
+    parser.add_argument("--retry-backoff", type=float, default=RETRY_BACKOFF)
+    parser.add_argument("--benchmark", action="store_true", help="Medir rendimiento sobre una copia temporal de las notas")
+    parser.add_argument("--bench-notes", type=int, default=200, help="Notas sintéticas si no existe --pages-dir")
+    parser.add_argument("--fake-latency-ms", type=float, default=FAKE_CONFIG["latency_ms"])
+    parser.add_argument("--fake-latency-dist", choices=["constant", "uniform", "exponential", "lognormal"], default=FAKE_CONFIG["latency_dist"])
+    parser.add_argument("--fake-error-rate", type=float, default=FAKE_CONFIG["error_rate"])
+    parser.add_argument("--fake-429-rate", type=float, default=FAKE_CONFIG["rate_limit_rate"])
+    parser.add_argument("--fake-messy-rate", type=float, default=FAKE_CONFIG["messy_rate"])
+    parser.add_argument("--seed", type=int, help="Semilla del proveedor simulado")
+    return parser.parse_args()
+
+def main():
+    global MAX_RETRIES, RETRY_BACKOFF
+    args = parse_args()
+    MAX_RETRIES = args.max_retries
+    RETRY_BACKOFF = args.retry_backoff
+    FAKE_CONFIG.update({
+        "latency_dist": args.fake_latency_dist,
+        "latency_ms": args.fake_latency_ms,
+        "error_rate": args.fake_error_rate,
+        "rate_limit_rate": args.fake_429_rate,
+        "messy_rate": args.fake_messy_rate,
+    })
+    if args.seed is not None: FAKE_RNG.seed(args.seed)
+
+    priority = [c.strip() for c in args.priority.split(',') if c.strip()]
+    unknown = [c for c in priority if c not in ("untagged", "recent", "short", "namespace")]
+    if unknown:
+        print(f"❌ Criterio de prioridad desconocido: {', '.join(unknown)}")
+        return
+    namespaces = [n.strip() for n in args.namespaces.split(',') if n.strip()]
+    budget = {"minutes": args.max_minutes, "tokens": args.max_tokens, "cost": args.max_cost}
+
+    print("🤖 AUTO TAGGER V3.1 (Robust Parser)")
+    print("-----------------------------------")
+    provider = args.provider
+    if not provider:
+        print("1. Ollama (Local)")
+        print("2. Gemini (Cloud)")
+        choice = input("\nOpción [1/2]: ").strip()
+        provider = "gemini" if choice == "2" else "ollama"
+
+    if not setup_provider(provider): return
+
+    path = Path(args.pages_dir)
+    if args.benchmark:
+        run_benchmark(provider, path, args.bench_notes, args.limit, priority, namespaces, budget)
+        return
+
+    if not path.exists():
+        print(f"❌ No existe {args.pages_dir}")
+        return
+
+    all_files = [f for f in path.iterdir() if f.is_file() and f.suffix == '.md' and not is_index_file(f.name)]
+    pending_files = schedule_notes(all_files, priority, namespaces)
+    limit = args.limit if args.limit > 0 else len(pending_files)
+    files_to_process = pending_files[:limit]
+    
+    print(f"\n📂 Procesando {len(files_to_process)} notas ({len(all_files) - len(pending_files)} ya resumidas o sin frontmatter, orden: {', '.join(priority)}{' | primero: ' + ', '.join(namespaces) if namespaces else ''})...")
+    print("-" * 60)
+    
+    metrics = new_metrics()
+    stats = run_tagging(files_to_process, provider, metrics, budget=budget)
+
     print("\n" + "=" * 60)
-    print(f"🏁 HECHO: ✅{stats['ok']}  ⏩{stats['skip']}  ❌{stats['err']}")
+    print(f"🏁 HECHO: ✅{stats['ok']}  ⏩{stats['skip']}  ❌{stats['err']}  ⏳{stats['pending']}")
+    print(f"🔢 Tokens estimados: {metrics['tokens_in'] + metrics['tokens_out']} "
+          f"(${estimate_cost(provider, metrics['tokens_in'], metrics['tokens_out']):.4f})")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -4,9 +4,10 @@ import sys
 from pathlib import Path
 from datetime import datetime
 
+from migrate import INDEX_FILENAME, is_index_file, title_namespace, write_sharded_index
+
 # --- CONFIGURATION ---
 PAGES_DIR = "logseq-output/pages"
-INDEX_FILENAME = "000_Indice_Migracion.md"
 
 # 1. Regex para DETECTAR duplicados iniciales (Fase de fusión)
 DUPLICATE_PATTERN = re.compile(r'([-_ ]\d+|_+|\.txt[._]?|\(\d+\))+$')
@@ -56,6 +57,16 @@ def parse_frontmatter(content):
                     
     return meta, body.strip()
 
+def page_namespace(file_path):
+    """Namespace de una página según su 'title:' jerárquico (Carpeta/.../Nota)."""
+    with open(file_path, 'r', encoding='utf-8') as f:
+        if f.readline().strip() != "---": return title_namespace("")
+        for line in f:
+            if line.strip() == "---": break
+            if line.lower().startswith("title:"):
+                return title_namespace(line.split(":", 1)[1].strip())
+    return title_namespace("")
+
 def find_true_master(filename, all_filenames_set):
     current_name = Path(filename).stem
     while True:
@@ -137,7 +148,7 @@ def clean_filenames_phase(path):
     print("🧹 FASE 3: LIMPIEZA PROFUNDA DE NOMBRES")
     print("="*40)
     
-    files = [f for f in path.iterdir() if f.is_file() and f.suffix == '.md']
+    files = [f for f in path.iterdir() if f.is_file() and f.suffix == '.md' and not is_index_file(f.name)]
     processed_count = 0
     
     for f in files:
@@ -201,20 +212,15 @@ def regenerate_index(path):
     print("🗺️  FASE 4: REGENERANDO ÍNDICE MAESTRO")
     print("="*40)
     
-    files = [f for f in path.iterdir() if f.is_file() and f.suffix == '.md' and f.name != INDEX_FILENAME]
-    files.sort(key=lambda x: x.name)
-    
-    content = f"---\ntitle: Índice de Migración (Consolidado)\ndate: [[{datetime.now().strftime('%Y-%m-%d')}]]\n---\n"
-    content += "### 🚀 Resumen Post-Limpieza\n"
-    content += f"Actualizado el: {datetime.now().strftime('%Y-%m-%d %H:%M')}\n"
-    content += f"Total notas consolidadas: {len(files)}\n\n"
-    content += "### 📂 Notas Activas\n"
+    files = [f for f in path.iterdir() if f.is_file() and f.suffix == '.md' and not is_index_file(f.name)]
     
-    for f in files:
-        content += f"- [[{f.stem}]]\n"
-        
-    with open(path / INDEX_FILENAME, 'w', encoding='utf-8') as f:
-        f.write(content)
+    summary = [
+        "### 🚀 Resumen Post-Limpieza",
+        f"Actualizado el: {datetime.now().strftime('%Y-%m-%d %H:%M')}",
+        f"Total notas consolidadas: {len(files)}",
+    ]
+    pages = [(f.name, page_namespace(f)) for f in files]
+    write_sharded_index(path, pages, "Índice de Migración (Consolidado)", summary)
         
     print(f"✅ Índice actualizado: {INDEX_FILENAME} ({len(files)} entradas)")
 
@@ -225,7 +231,7 @@ def main():
         return
 
     # FASE 1 & 2
-    all_files = [f for f in path.iterdir() if f.is_file() and f.suffix == '.md']
+    all_files = [f for f in path.iterdir() if f.is_file() and f.suffix == '.md' and not is_index_file(f.name)]
     all_filenames_set = set(f.name for f in all_files)
     
     print(f"🔍 FASE 1: Análisis inicial de {len(all_files)} archivos...")
@@ -1,9 +1,18 @@
 import os
 import shutil
 import re
+import errno
 import sys
 import html
+import hashlib
+import time
+import struct
+import select
+import argparse
+import ctypes
+import ctypes.util
 from pathlib import Path
+from urllib.parse import unquote
 from datetime import datetime
 
 # --- CONFIGURATION ---
@@ -25,6 +34,24 @@ METADATA_BLACKLIST = [
     "id", "parent_id", "type_"
 ]
 
+# Watch mode: segundos de calma antes de sincronizar una ráfaga de cambios
+WATCH_DEBOUNCE = 2.0
+WATCH_POLL_INTERVAL = 5.0
+# Con eventos continuos, sincronizar igualmente tras N x debounce desde el primero
+WATCH_MAX_WAIT_FACTOR = 10
+
+# Índice maestro: página raíz pequeña + una página (shard) por grupo de notas
+INDEX_FILENAME = "000_Indice_Migracion.md"
+INDEX_STEM = INDEX_FILENAME[:-3]
+INDEX_SHARD_MODE = "namespace"  # "namespace" (prefijo Carpeta.) o "letter" (inicial)
+NO_NAMESPACE_SHARD = "Sin_Carpeta"
+
+# Assets: solo se copian los referenciados desde alguna nota (poda por alcanzabilidad)
+PRUNE_ORPHAN_ASSETS = True
+ASSET_REPORT_FILENAME = "informe_assets.md"
+# Enlaces a adjuntos tal y como los deja clean_and_convert_content: (../assets/nombre.ext "titulo")
+ASSET_LINK_PATTERN = re.compile(r'\(\.\./assets/([^)\s]+)')
+
 def sanitize_name(name):
     """Limpia nombres de archivo y carpetas."""
     try:
@@ -168,6 +195,28 @@ def clean_and_convert_content(content):
     content = re.sub(r'\[([^\]]+)\]\(([^)]+\.md)\)', link_replacer, content)
     return content
 
+def extract_asset_references(content):
+    """Devuelve el conjunto de assets enlazados desde una nota ya convertida."""
+    refs = set()
+    for match in ASSET_LINK_PATTERN.finditer(content):
+        name = unquote(match.group(1)).split('#', 1)[0].split('?', 1)[0]
+        if name:
+            refs.add(Path(name).name)
+    return refs
+
+def write_asset_report(out_path, orphaned, broken):
+    """Informe de recursos huérfanos (sin nota que los use) y referencias rotas."""
+    report_path = out_path / ASSET_REPORT_FILENAME
+    with open(report_path, 'w', encoding='utf-8') as f:
+        f.write(f"# Informe de Assets ({datetime.now().strftime('%Y-%m-%d %H:%M')})\n\n")
+        f.write(f"## 🗑️ Recursos huérfanos ({len(orphaned)})\n")
+        for name in sorted(orphaned):
+            f.write(f"- {name}\n")
+        f.write(f"\n## 💔 Referencias rotas ({len(broken)})\n")
+        for name in sorted(broken):
+            f.write(f"- {name} <- {', '.join(sorted(broken[name]))}\n")
+    print(f"📝 Informe de assets: {ASSET_REPORT_FILENAME} (🗑️ {len(orphaned)} huérfanos, 💔 {len(broken)} rotos)")
+
 def get_unique_filename(directory, filename):
     name, ext = os.path.splitext(filename)
     counter = 1
@@ -177,51 +226,191 @@ def get_unique_filename(directory, filename):
         counter += 1
     return new_filename
 
-def generate_index_file(pages_dir, migrated_files):
-    index_name = "000_Indice_Migracion.md"
-    content = f"---\ntitle: Índice de Migración Joplin\ndate: [[{datetime.now().strftime('%Y-%m-%d')}]]\n---\n"
-    content += "### 🚀 Resumen de Importación\n"
-    content += f"Importado el: {datetime.now().strftime('%Y-%m-%d %H:%M')}\n"
-    content += f"Total notas: {len(migrated_files)}\n\n"
-    content += "### 📂 Notas Importadas\n"
-    migrated_files.sort()
-    for filename in migrated_files:
-        link_name = Path(filename).stem
-        content += f"- [[{link_name}]]\n"
-    with open(pages_dir / index_name, 'w', encoding='utf-8') as f:
-        f.write(content)
-    print(f"🗺️  Índice maestro creado: {index_name}")
+def is_index_file(filename):
+    """True para la página raíz del índice y para sus shards."""
+    return filename == INDEX_FILENAME or (filename.startswith(INDEX_STEM + ".") and filename.endswith(".md"))
 
-def main():
-    start_time = datetime.now()
-    base_path = Path.cwd()
-    src_path = base_path / SOURCE_DIR
-    out_path = base_path / OUTPUT_DIR
+def title_namespace(title):
+    """Carpeta de primer nivel a partir del título jerárquico (Carpeta/.../Nota)."""
+    if "/" in title:
+        return title.split("/", 1)[0].strip() or NO_NAMESPACE_SHARD
+    return NO_NAMESPACE_SHARD
+
+def index_shard_key(page_name, namespace, mode=None):
+    """
+    Shard de una página. En modo namespace se usa la carpeta real de la nota,
+    no el nombre de archivo (los puntos pueden formar parte de los nombres).
+    """
+    mode = mode or INDEX_SHARD_MODE
+    if mode == "letter":
+        first = Path(page_name).stem[:1].upper()
+        if first.isalpha(): return first
+        if first.isdigit(): return "0-9"
+        return "Otros"
+    return namespace or NO_NAMESPACE_SHARD
+
+def read_shard_hash(shard_path):
+    """Lee 'index-hash' del frontmatter de un shard existente sin cargar el resto."""
+    try:
+        with open(shard_path, 'r', encoding='utf-8') as f:
+            for i, line in enumerate(f):
+                if line.startswith("index-hash:"):
+                    return line.split(":", 1)[1].strip()
+                if i > 0 and line.startswith("---"):
+                    break
+    except FileNotFoundError:
+        pass
+    return None
+
+def write_sharded_index(pages_dir, pages, title, summary_lines):
+    """
+    Escribe el índice repartido en shards (por namespace o por inicial) y una
+    página raíz (titulada INDEX_STEM, padre del namespace de los shards, con
+    'title' como alias) que enlaza a ellos. 'pages' son pares (archivo, namespace).
+    Un shard solo se reescribe si cambia su lista de miembros; los shards que se
+    quedan vacíos se borran.
+    """
+    shards = {}
+    for name, namespace in pages:
+        if is_index_file(name): continue
+        shards.setdefault(index_shard_key(name, namespace), []).append(Path(name).stem)
+
+    written = 0
+    for key, stems in shards.items():
+        stems.sort()
+        digest = hashlib.sha1("\n".join(stems).encode('utf-8')).hexdigest()
+        shard_path = pages_dir / f"{INDEX_STEM}.{key}.md"
+        if read_shard_hash(shard_path) == digest:
+            continue
+        with open(shard_path, 'w', encoding='utf-8') as f:
+            f.write(f"---\ntitle: {INDEX_STEM}/{key}\nindex-hash: {digest}\n---\n")
+            f.write(f"### 📂 {key} ({len(stems)})\n")
+            for stem in stems:
+                f.write(f"- [[{stem}]]\n")
+        written += 1
+
+    removed = 0
+    for old_shard in pages_dir.glob(f"{INDEX_STEM}.*.md"):
+        if old_shard.stem[len(INDEX_STEM) + 1:] not in shards:
+            old_shard.unlink()
+            removed += 1
+
+    with open(pages_dir / INDEX_FILENAME, 'w', encoding='utf-8') as f:
+        # El título coincide con el namespace de los shards; el nombre legible va como alias
+        f.write(f"---\ntitle: {INDEX_STEM}\nalias: {title}\ndate: [[{datetime.now().strftime('%Y-%m-%d')}]]\n---\n")
+        for line in summary_lines:
+            f.write(f"{line}\n")
+        f.write("\n### 📂 Secciones\n")
+        for key in sorted(shards):
+            f.write(f"- [[{INDEX_STEM}/{key}]] ({len(shards[key])})\n")
+
+    print(f"🗂️  Shards: {len(shards)} ({written} reescritos, {len(shards) - written} sin cambios, {removed} eliminados)")
+    return written, removed
+
+def generate_index_file(pages_dir, migrated_notes):
+    summary = [
+        "### 🚀 Resumen de Importación",
+        f"Importado el: {datetime.now().strftime('%Y-%m-%d %H:%M')}",
+        f"Total notas: {len(migrated_notes)}",
+    ]
+    pages = [(note['name'], note['namespace']) for note in migrated_notes]
+    write_sharded_index(pages_dir, pages, "Índice de Migración Joplin", summary)
+    print(f"🗺️  Índice maestro creado: {INDEX_FILENAME}")
+
+def build_output_name(rel_path):
+    """Nombre con namespace (Carpeta.Nota.md) y título jerárquico de una nota."""
+    file = rel_path.name
+    clean_parts = [sanitize_name(p) for p in rel_path.parent.parts]
     
-    if not src_path.exists():
-        print(f"❌ ERROR: No encuentro la carpeta '{SOURCE_DIR}'")
-        sys.exit(1)
+    raw_stem = file[:-3]
+    if file.endswith("..md"): raw_stem = file[:-4]
+    file_stem = sanitize_name(raw_stem)
+    
+    if not file_stem: file_stem = "Sin_Nombre_" + str(int(datetime.now().timestamp()))
 
-    if out_path.exists():
-        shutil.rmtree(out_path)
+    if clean_parts:
+        filename_structure = ".".join(clean_parts) + "." + file_stem + ".md"
+        hierarchy_title = "/".join(clean_parts) + "/" + file_stem
+    else:
+        filename_structure = file_stem + ".md"
+        hierarchy_title = file_stem
+    return filename_structure, hierarchy_title
+
+def migrate_note(original_file_path, src_path, pages_dir, unique_name=None):
+    """
+    Convierte una nota y la escribe en pages/. Si no se indica 'unique_name'
+    se elige uno libre. Devuelve la entrada de estado de la nota.
+    """
+    rel_path = original_file_path.relative_to(src_path)
+    filename_structure, hierarchy_title = build_output_name(rel_path)
+    if unique_name is None:
+        unique_name = get_unique_filename(pages_dir, filename_structure)
     
-    (out_path / LOGSEQ_ASSETS).mkdir(parents=True, exist_ok=True)
-    (out_path / LOGSEQ_PAGES).mkdir(parents=True, exist_ok=True)
+    with open(original_file_path, 'r', encoding='utf-8') as f:
+        content = f.read()
 
-    print(f"🚀 Iniciando Migración v3.5 (YAML Estándar + Fix Duplicados)")
+    content = process_frontmatter(content, rel_path.name, hierarchy_title)
+    content = clean_and_convert_content(content)
+
+    with open(pages_dir / unique_name, 'w', encoding='utf-8') as f:
+        f.write(content)
     
-    # PHASE 1: ASSETS
+    return {'name': unique_name, 'structure': filename_structure, 'namespace': title_namespace(hierarchy_title),
+            'assets': extract_asset_references(content)}
+
+def sync_assets(src_path, out_path, state, changed_assets=()):
+    """
+    Deja en assets/ exactamente los recursos alcanzables desde alguna nota
+    (o todos si PRUNE_ORPHAN_ASSETS está desactivado) y reescribe el informe.
+    Solo copia los que faltan o los que aparecen en 'changed_assets'.
+    """
     src_resources = src_path / JOPLIN_RESOURCES
     dest_assets = out_path / LOGSEQ_ASSETS
+    available = {}
     if src_resources.exists():
-        files = [f for f in src_resources.iterdir() if f.is_file()]
-        for item in files:
-            shutil.copy2(item, dest_assets / item.name)
-        print(f"📦 Assets copiados: {len(files)}")
+        available = {f.name: f for f in src_resources.iterdir() if f.is_file()}
+
+    asset_refs = {}  # asset -> notas que lo enlazan
+    for note in state['notes'].values():
+        for asset in note['assets']:
+            asset_refs.setdefault(asset, []).append(note['name'])
+
+    if PRUNE_ORPHAN_ASSETS:
+        wanted = {name for name in asset_refs if name in available}
+    else:
+        wanted = set(available)
+
+    dest_assets.mkdir(parents=True, exist_ok=True)
+    copied = 0
+    for name in wanted:
+        if name in changed_assets or not (dest_assets / name).exists():
+            try:
+                shutil.copy2(available[name], dest_assets / name)
+            except FileNotFoundError:
+                continue  # Borrado entre el listado y la copia: llegará en el siguiente lote
+            copied += 1
+    removed = 0
+    for item in dest_assets.iterdir():
+        if item.is_file() and item.name not in wanted:
+            item.unlink()
+            removed += 1
+    print(f"📦 Assets copiados: {copied} de {len(available)}" + (f" (🗑️ {removed} retirados)" if removed else ""))
+
+    orphaned = [name for name in available if name not in asset_refs]
+    broken = {name: notes for name, notes in asset_refs.items() if name not in available}
+    write_asset_report(out_path, orphaned, broken)
+
+def run_migration(src_path, out_path):
+    """Migración completa desde cero. Devuelve el estado {'notes': {ruta_relativa: nota}}."""
+    if out_path.exists():
+        shutil.rmtree(out_path)
+    
+    (out_path / LOGSEQ_ASSETS).mkdir(parents=True, exist_ok=True)
+    (out_path / LOGSEQ_PAGES).mkdir(parents=True, exist_ok=True)
 
-    # PHASE 2: NOTES
+    # PHASE 1: NOTES (y de paso, índice de referencias a assets)
     pages_dir = out_path / LOGSEQ_PAGES
-    migrated_filenames = []
+    state = {'notes': {}}
     
     for root, dirs, files in os.walk(src_path):
         if JOPLIN_RESOURCES in dirs: dirs.remove(JOPLIN_RESOURCES)
@@ -230,46 +419,267 @@ def main():
             if file.endswith(".md"):
                 try:
                     original_file_path = Path(root) / file
-                    
-                    # Sanitización
-                    rel_path = original_file_path.relative_to(src_path)
-                    clean_parts = [sanitize_name(p) for p in rel_path.parent.parts]
-                    
-                    raw_stem = file[:-3]
-                    if file.endswith("..md"): raw_stem = file[:-4]
-                    file_stem = sanitize_name(raw_stem)
-                    
-                    if not file_stem: file_stem = "Sin_Nombre_" + str(int(datetime.now().timestamp()))
-
-                    if clean_parts:
-                        filename_structure = ".".join(clean_parts) + "." + file_stem + ".md"
-                        hierarchy_title = "/".join(clean_parts) + "/" + file_stem
-                    else:
-                        filename_structure = file_stem + ".md"
-                        hierarchy_title = file_stem
-                    
-                    unique_name = get_unique_filename(pages_dir, filename_structure)
-                    
-                    # Procesamiento
-                    with open(original_file_path, 'r', encoding='utf-8') as f:
-                        content = f.read()
-
-                    content = process_frontmatter(content, file, hierarchy_title)
-                    content = clean_and_convert_content(content)
-
-                    with open(pages_dir / unique_name, 'w', encoding='utf-8') as f:
-                        f.write(content)
-                    
-                    migrated_filenames.append(unique_name)
-                    
+                    note = migrate_note(original_file_path, src_path, pages_dir)
+                    state['notes'][original_file_path.relative_to(src_path)] = note
                 except Exception as e:
                     print(f"❌ Error en: {file} -> {e}")
 
-    if migrated_filenames:
-        generate_index_file(pages_dir, migrated_filenames)
+    # PHASE 2: ASSETS (solo los alcanzables desde alguna nota)
+    sync_assets(src_path, out_path, state)
+
+    if state['notes']:
+        generate_index_file(pages_dir, list(state['notes'].values()))
+    return state
+
+# --- WATCH MODE ---
+def sync_changes(src_path, out_path, state, changed):
+    """Vuelve a procesar solo las notas y assets afectados por una ráfaga de cambios."""
+    pages_dir = out_path / LOGSEQ_PAGES
+    src_resources = src_path / JOPLIN_RESOURCES
+    changed_assets = set()
+    to_migrate = set()
+    changed_dirs = set()
+    deleted = 0
+
+    for p in changed:
+        if p == src_resources or src_resources in p.parents:
+            changed_assets.add(p.name)
+            continue
+        if p in src_resources.parents:
+            # Cambio en la raíz (o desbordamiento de eventos): revisar todos los assets
+            changed_assets.update(f.name for f in src_resources.glob('*'))
+
+        # Nota conocida: se consulta directamente; si ya no existe, fue borrada o movida
+        rel = p.relative_to(src_path)
+        if rel in state['notes']:
+            if not p.exists():
+                (pages_dir / state['notes'].pop(rel)['name']).unlink(missing_ok=True)
+                deleted += 1
+        elif not p.is_file():
+            changed_dirs.add(rel)  # Carpeta (existente o desaparecida): revisar sus notas abajo
+
+        if p.is_dir():
+            for root, dirs, files in os.walk(p):
+                if JOPLIN_RESOURCES in dirs: dirs.remove(JOPLIN_RESOURCES)
+                to_migrate.update(Path(root) / f for f in files if f.endswith(".md"))
+        elif p.suffix == ".md" and p.exists():
+            to_migrate.add(p)
+
+    # Notas bajo carpetas borradas o movidas: una sola pasada, O(notas x profundidad)
+    if changed_dirs:
+        for rel in list(state['notes']):
+            if any(parent in changed_dirs for parent in rel.parents) and not (src_path / rel).exists():
+                (pages_dir / state['notes'].pop(rel)['name']).unlink(missing_ok=True)
+                deleted += 1
+
+    for original_file_path in sorted(to_migrate):
+        rel = original_file_path.relative_to(src_path)
+        previous = state['notes'].get(rel)
+        unique_name = None
+        if previous:
+            if previous['structure'] == build_output_name(rel)[0]:
+                unique_name = previous['name']
+            else:
+                (pages_dir / previous['name']).unlink(missing_ok=True)
+        try:
+            state['notes'][rel] = migrate_note(original_file_path, src_path, pages_dir, unique_name)
+        except Exception as e:
+            state['notes'].pop(rel, None)
+            print(f"❌ Error en: {original_file_path.name} -> {e}")
+
+    if to_migrate or deleted or changed_assets:
+        sync_assets(src_path, out_path, state, changed_assets)
+    if to_migrate or deleted:
+        generate_index_file(pages_dir, list(state['notes'].values()))
+    print(f"🔄 [{datetime.now().strftime('%H:%M:%S')}] Notas actualizadas: {len(to_migrate)} | Eliminadas: {deleted}")
+
+# Constantes de <sys/inotify.h>
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+INOTIFY_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+INOTIFY_EVENT = struct.Struct("iIII")  # wd, mask, cookie, len
+
+def inotify_add_tree(inotify, directory):
+    for root, dirs, files in os.walk(directory):
+        wd = inotify['libc'].inotify_add_watch(inotify['fd'], os.fsencode(root), INOTIFY_MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            if err == errno.ENOENT: continue  # La carpeta desapareció mientras la recorríamos
+            raise OSError(err, os.strerror(err), root)
+        inotify['watches'][wd] = Path(root)
+
+def open_inotify(src_path):
+    """Inicializa inotify (vía libc) con un watch por carpeta. Lanza OSError si no está disponible."""
+    if not sys.platform.startswith("linux"):
+        raise OSError("inotify solo existe en Linux")
+    libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+    fd = libc.inotify_init()
+    if fd < 0:
+        err = ctypes.get_errno()
+        raise OSError(err, os.strerror(err))
+    inotify = {'libc': libc, 'fd': fd, 'watches': {}}
+    try:
+        inotify_add_tree(inotify, src_path)
+    except OSError:
+        os.close(fd)
+        raise
+    return inotify
+
+def inotify_batches(inotify, src_path, debounce, interval):
+    """
+    Genera conjuntos de rutas cambiadas tras 'debounce' segundos sin eventos,
+    o como mucho WATCH_MAX_WAIT_FACTOR x debounce después del primero.
+    """
+    fd = inotify['fd']
+    watches = inotify['watches']
+    max_wait = debounce * WATCH_MAX_WAIT_FACTOR
+    pending = set()
+    first_event = 0
+    while True:
+        timeout = None
+        if pending:
+            timeout = min(debounce, first_event + max_wait - time.monotonic())
+        if timeout is not None and timeout <= 0:
+            ready = []
+        else:
+            ready, _, _ = select.select([fd], [], [], timeout)
+        if not ready:
+            yield pending
+            pending = set()
+            continue
+        if not pending:
+            first_event = time.monotonic()
+        data = os.read(fd, 64 * 1024)
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = INOTIFY_EVENT.unpack_from(data, offset)
+            name = data[offset + INOTIFY_EVENT.size:offset + INOTIFY_EVENT.size + length].split(b"\0", 1)[0]
+            offset += INOTIFY_EVENT.size + length
+
+            if mask & IN_Q_OVERFLOW:
+                pending.add(src_path)
+                continue
+            if mask & IN_IGNORED:
+                watches.pop(wd, None)
+                continue
+            if wd not in watches:
+                continue
+            path = watches[wd] / os.fsdecode(name) if name else watches[wd]
+            pending.add(path)
+
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO) and path.is_dir():
+                    try:
+                        inotify_add_tree(inotify, path)
+                    except OSError as e:
+                        # Normalmente ENOSPC (max_user_watches agotado): seguir por sondeo
+                        print(f"⚠️ inotify no puede vigilar '{path.name}' ({e}). Pasando a sondeo.")
+                        os.close(fd)
+                        baseline = snapshot_tree(src_path)
+                        pending.add(src_path)  # Resincronizar todo: pudimos perder eventos
+                        yield pending
+                        yield from polling_batches(src_path, debounce, interval, baseline)
+                        return
+                elif mask & IN_MOVED_FROM:
+                    for stale_wd, watched in list(watches.items()):
+                        if watched == path or path in watched.parents:
+                            inotify['libc'].inotify_rm_watch(fd, stale_wd)
+                            watches.pop(stale_wd, None)
+
+def snapshot_tree(src_path):
+    snapshot = {}
+    for root, dirs, files in os.walk(src_path):
+        for file in files:
+            try:
+                st = os.stat(os.path.join(root, file))
+            except FileNotFoundError:
+                continue
+            snapshot[Path(root) / file] = (st.st_mtime_ns, st.st_size)
+    return snapshot
+
+def polling_batches(src_path, debounce, interval, previous):
+    """Alternativa sin inotify: compara instantáneas (mtime, tamaño) con 'previous'."""
+    max_wait = debounce * WATCH_MAX_WAIT_FACTOR
+    pending = set()
+    first_change = last_change = 0
+    while True:
+        time.sleep(min(interval, debounce) if pending else interval)
+        current = snapshot_tree(src_path)
+        changed = {p for p in current.keys() | previous.keys() if current.get(p) != previous.get(p)}
+        previous = current
+        now = time.monotonic()
+        if changed:
+            if not pending: first_change = now
+            pending |= changed
+            last_change = now
+        if pending and (now - last_change >= debounce or now - first_change >= max_wait):
+            yield pending
+            pending = set()
+
+def start_watch(src_path, force_poll=False, debounce=WATCH_DEBOUNCE, interval=WATCH_POLL_INTERVAL):
+    """
+    Empieza a registrar cambios (fd de inotify o instantánea base) antes de la
+    migración completa, para no perder lo que se edite mientras tanto.
+    """
+    if not force_poll:
+        try:
+            batches = inotify_batches(open_inotify(src_path), src_path, debounce, interval)
+            print(f"👀 Vigilando '{src_path.name}' con inotify (debounce {debounce}s).")
+            return batches
+        except (OSError, AttributeError) as e:
+            print(f"⚠️ inotify no disponible ({e}). Usando sondeo.")
+    batches = polling_batches(src_path, debounce, interval, snapshot_tree(src_path))
+    print(f"👀 Vigilando '{src_path.name}' por sondeo cada {interval}s.")
+    return batches
+
+def watch(src_path, out_path, state, batches):
+    print("🔁 Sincronizando cambios. Ctrl+C para salir.")
+    try:
+        for changed in batches:
+            try:
+                sync_changes(src_path, out_path, state, changed)
+            except Exception as e:
+                print(f"❌ Error sincronizando cambios -> {e}")
+    except KeyboardInterrupt:
+        print("\n👋 Watch detenido")
+
+def main():
+    parser = argparse.ArgumentParser(description="Migra una exportación de Joplin a un grafo de Logseq.")
+    parser.add_argument("--watch", action="store_true", help="Tras migrar, seguir sincronizando los cambios de Joplin")
+    parser.add_argument("--poll", action="store_true", help="Forzar sondeo en lugar de inotify")
+    parser.add_argument("--debounce", type=float, default=WATCH_DEBOUNCE, help="Segundos de calma antes de sincronizar")
+    parser.add_argument("--interval", type=float, default=WATCH_POLL_INTERVAL, help="Segundos entre sondeos")
+    args = parser.parse_args()
+
+    start_time = datetime.now()
+    base_path = Path.cwd()
+    src_path = base_path / SOURCE_DIR
+    out_path = base_path / OUTPUT_DIR
+    
+    if not src_path.exists():
+        print(f"❌ ERROR: No encuentro la carpeta '{SOURCE_DIR}'")
+        sys.exit(1)
+
+    print(f"🚀 Iniciando Migración v3.5 (YAML Estándar + Fix Duplicados)")
+    
+    batches = None
+    if args.watch:
+        batches = start_watch(src_path, args.poll, args.debounce, args.interval)
+
+    state = run_migration(src_path, out_path)
 
     print(f"🏁 TERMINADO en {datetime.now() - start_time}")
-    print(f"✅ Notas migradas: {len(migrated_filenames)}")
+    print(f"✅ Notas migradas: {len(state['notes'])}")
+
+    if args.watch:
+        watch(src_path, out_path, state, batches)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file